@@ -13,9 +13,12 @@
 
 from __future__ import annotations
 
-import re
 import math
+import queue
 import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Optional, List, Dict, Any
@@ -39,6 +42,16 @@ try:
 except Exception:  # pragma: no cover
     requests = None  # type: ignore
 
+try:
+    import numpy as np
+except Exception:  # pragma: no cover
+    np = None  # type: ignore
+
+try:
+    from numba import njit  # type: ignore
+except Exception:  # pragma: no cover
+    njit = None  # type: ignore
+
 # Google OAuth imports
 try:
     from google_auth_oauthlib.flow import Flow
@@ -54,9 +67,13 @@ except Exception:  # pragma: no cover
 # ---------------------------------
 st.set_page_config(page_title="BITS-H Pooler", page_icon="🚕", layout="wide")
 
+# Partial reruns (Streamlit >= 1.37; experimental name before that). None -> full-page autorefresh.
+st_fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None)
+
 DB_PATH = Path("pools.db")
 COOLDOWN_MINUTES = 15
 SEATS_MIN, SEATS_MAX = 1, 10
+READER_POOL_SIZE = 4
 
 # OAuth scopes
 SCOPES = [
@@ -73,7 +90,8 @@ DESTINATIONS: List[Dict[str, Any]] = []  # kept for compatibility; unused in UI
 # ---------------------------------
 
 def is_bits_email(email: str) -> bool:
-    return bool(re.search(r"@hyderabad\.bits-pilani\.ac\.in$", email.strip(), re.IGNORECASE))
+    """Plain ASCII suffix check; IDNA/Unicode normalization is out of scope."""
+    return email.strip().lower().endswith("@hyderabad.bits-pilani.ac.in")
 
 
 def now_iso() -> str:
@@ -89,8 +107,46 @@ def haversine_km(a: Dict[str, float], b: Dict[str, float]) -> float:
     dlat = lat2 - lat1
     dlon = lon2 - lon1
     x = math.sin(dlat / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon / 2) ** 2
-    c = 2 * math.atan2(math.sqrt(x), math.sqrt(1 - x))
-    return R * c
+    # Clamp: FP roundoff near antipodes can push x slightly above 1
+    return 2 * R * math.asin(math.sqrt(min(1.0, x)))
+
+
+def _haversine_loop(t_lat: float, t_lng: float, lat_rad, lng_rad):
+    # Fused per-point loop; only used when numba can compile it (no temporaries)
+    out = np.empty(lat_rad.shape[0])
+    for i in range(lat_rad.shape[0]):
+        lat = lat_rad[i]
+        x = math.sin((lat - t_lat) / 2) ** 2 + math.cos(t_lat) * math.cos(lat) * math.sin((lng_rad[i] - t_lng) / 2) ** 2
+        out[i] = 2 * 6371.0 * math.asin(math.sqrt(min(1.0, x)))
+    return out
+
+
+if njit is not None:
+    _haversine_loop = njit(cache=True, fastmath=True)(_haversine_loop)
+
+
+def haversine_km_many(target: Dict[str, float], lat_rad, lng_rad):
+    """Vectorized haversine_km from one target (degrees) to arrays of lat/lng in radians."""
+    R = 6371.0
+    t_lat, t_lng = math.radians(target["lat"]), math.radians(target["lng"])
+    if njit is not None:
+        return _haversine_loop(t_lat, t_lng, lat_rad, lng_rad)
+    dlat = lat_rad - t_lat
+    dlon = lng_rad - t_lng
+    x = np.sin(dlat / 2) ** 2 + math.cos(t_lat) * np.cos(lat_rad) * np.sin(dlon / 2) ** 2
+    return 2 * R * np.arcsin(np.sqrt(np.minimum(x, 1.0)))
+
+
+def pool_coords_rad(pools: List[Dict[str, Any]]):
+    """Pool lat/lng as contiguous radian arrays, reused across reruns while the pool ids are unchanged."""
+    ids = tuple(p["id"] for p in pools)
+    cached = st.session_state.get("_pool_coords_rad")
+    if cached and cached[0] == ids:
+        return cached[1], cached[2]
+    lat_rad = np.radians(np.fromiter((p["lat"] for p in pools), dtype=np.float64, count=len(pools)))
+    lng_rad = np.radians(np.fromiter((p["lng"] for p in pools), dtype=np.float64, count=len(pools)))
+    st.session_state["_pool_coords_rad"] = (ids, lat_rad, lng_rad)
+    return lat_rad, lng_rad
 
 
 def get_maps_cfg() -> Optional[str]:
@@ -102,28 +158,44 @@ def get_maps_cfg() -> Optional[str]:
         return None
 
 
+@st.cache_resource
+def _http() -> "requests.Session":
+    # Pooled keep-alive session so repeat Places calls skip the TCP/TLS handshake
+    s = requests.Session()
+    s.mount("https://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=8))
+    return s
+
+
+@st.cache_data(ttl=600, show_spinner=False)
+def _places_text_search(query: str, limit: int, _key: str) -> List[Dict[str, Any]]:
+    # _key is excluded from the cache key; raising keeps API errors out of the cache
+    url = "https://maps.googleapis.com/maps/api/place/textsearch/json"
+    resp = _http().get(url, params={"query": query, "key": _key}, timeout=8)
+    data = resp.json()
+    status = data.get("status", "UNKNOWN")
+    if status != "OK":
+        raise RuntimeError(f"Places API error: {status} {data.get('error_message', '')}")
+    results = []
+    for r in data.get("results", [])[:limit]:
+        results.append({
+            "id": r.get("place_id"),
+            "name": r.get("name"),
+            "lat": r.get("geometry", {}).get("location", {}).get("lat"),
+            "lng": r.get("geometry", {}).get("location", {}).get("lng"),
+            "formatted_address": r.get("formatted_address"),
+        })
+    return results
+
+
 def google_places_search(query: str, key: str, limit: int = 5) -> List[Dict[str, Any]]:
     if not requests or not key:
         return []
     try:
-        url = "https://maps.googleapis.com/maps/api/place/textsearch/json"
-        resp = requests.get(url, params={"query": query, "key": key}, timeout=8)
-        data = resp.json()
-        status = data.get("status", "UNKNOWN")
-        if status != "OK":
-            # Surface Google error so setup issues are obvious (e.g., key restrictions)
-            st.warning(f"Places API error: {status} {data.get('error_message', '')}")
-            return []
-        results = []
-        for r in data.get("results", [])[:limit]:
-            results.append({
-                "id": r.get("place_id"),
-                "name": r.get("name"),
-                "lat": r.get("geometry", {}).get("location", {}).get("lat"),
-                "lng": r.get("geometry", {}).get("location", {}).get("lng"),
-                "formatted_address": r.get("formatted_address"),
-            })
-        return results
+        return _places_text_search(query.strip().lower(), limit, key)
+    except RuntimeError as e:
+        # Surface Google error so setup issues are obvious (e.g., key restrictions)
+        st.warning(str(e))
+        return []
     except Exception as e:
         st.warning(f"Places API request failed: {e}")
         return []
@@ -147,8 +219,47 @@ def get_supabase_cfg() -> Optional[Dict[str, str]]:
     return None
 
 
-def get_conn():
-    return sqlite3.connect(DB_PATH, check_same_thread=False)
+def _open_conn() -> sqlite3.Connection:
+    con = sqlite3.connect(DB_PATH, check_same_thread=False)
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("PRAGMA synchronous=NORMAL")
+    con.execute("PRAGMA busy_timeout=5000")
+    con.execute("PRAGMA temp_store=MEMORY")
+    return con
+
+
+# Long-lived connections shared across reruns/sessions: one writer behind a lock
+# (SQLite allows a single writer) and a small pool of read-only readers (WAL).
+@st.cache_resource
+def _writer():
+    return _open_conn(), threading.Lock()
+
+
+@st.cache_resource
+def _readers() -> "queue.Queue[sqlite3.Connection]":
+    q: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+    for _ in range(READER_POOL_SIZE):
+        con = _open_conn()
+        con.execute("PRAGMA query_only=1")
+        q.put(con)
+    return q
+
+
+@contextmanager
+def writer_conn():
+    con, lock = _writer()
+    with lock, con:  # commits on success, rolls back on error
+        yield con
+
+
+@contextmanager
+def reader_conn():
+    readers = _readers()
+    con = readers.get()
+    try:
+        yield con
+    finally:
+        readers.put(con)
 
 
 def init_db():
@@ -164,7 +275,7 @@ def init_db():
             USE_SUPABASE = False
 
     # SQLite fallback schema
-    with get_conn() as con:
+    with writer_conn() as con:
         cur = con.cursor()
         cur.execute(
             """
@@ -195,6 +306,13 @@ def init_db():
             )
             """
         )
+        # Indexes for the hot lookups (future pools, spam guard). members(pool_id) and
+        # members(pool_id, email) are already served by the UNIQUE(pool_id, email) autoindex.
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_pools_when ON pools(when_iso)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_pools_host_created ON pools(host_email, created_at)")
+        # Duplicates of the autoindex created by an earlier build; they only slow writes
+        cur.execute("DROP INDEX IF EXISTS idx_members_pool")
+        cur.execute("DROP INDEX IF EXISTS idx_members_pool_email")
         con.commit()
 
 # Spam guard --------------------------------------------------------------
@@ -208,20 +326,17 @@ def can_host_create(email: str) -> bool:
             return not (res.data and len(res.data) > 0)
         except Exception:
             return True
-    with get_conn() as con:
+    with reader_conn() as con:
         cur = con.cursor()
         try:
-            cur.execute("SELECT created_at FROM pools WHERE host_email = ?", (email,))
-            rows = cur.fetchall()
-            for (created_at,) in rows:
-                try:
-                    if datetime.fromisoformat(created_at) >= since:
-                        return False
-                except Exception:
-                    continue
+            # created_at is ISO-8601, so string comparison is chronological
+            cur.execute(
+                "SELECT 1 FROM pools WHERE host_email = ? AND created_at >= ? LIMIT 1",
+                (email, since.isoformat()),
+            )
+            return cur.fetchone() is None
         except Exception:
             return True
-    return True
 
 # Core DB functions -------------------------------------------------------
 
@@ -245,10 +360,11 @@ def add_pool(pool: Dict[str, Any]):
                 "name": pool["host_name"],
                 "email": pool["host_email"],
             }).execute()
+        _fetch_future_pools_raw.clear()
         return
 
-    # SQLite fallback
-    with get_conn() as con:
+    # SQLite fallback: both inserts in one transaction (writer_conn commits once on exit)
+    with writer_conn() as con:
         cur = con.cursor()
         cur.execute(
             "INSERT INTO pools (id, destination_id, destination_name, lat, lng, when_iso, seats, mode, notes, host_name, host_email, created_at, pickup) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
@@ -259,12 +375,28 @@ def add_pool(pool: Dict[str, Any]):
             ),
         )
         cur.execute("INSERT OR IGNORE INTO members VALUES (?, ?, ?)", (pool["id"], pool["host_name"], pool["host_email"]))
-        con.commit()
-
-
-def list_future_pools() -> List[Dict[str, Any]]:
-    if USE_SUPABASE and SB is not None:
-        res = SB.table("pools").select("*").gte("when_iso", now_iso()).execute()
+    _fetch_future_pools_raw.clear()
+
+
+def list_future_pools(target_dt: Optional[datetime] = None, window_s: int = 900) -> List[Dict[str, Any]]:
+    """Future pools, optionally only those within ±window_s seconds of target_dt."""
+    start_iso = end_iso = None
+    if target_dt is not None:
+        start_iso = (target_dt - timedelta(seconds=window_s)).isoformat()
+        end_iso = (target_dt + timedelta(seconds=window_s)).isoformat()
+    return _fetch_future_pools_raw(USE_SUPABASE, start_iso, end_iso)
+
+
+@st.cache_data(ttl=3, show_spinner=False)
+def _fetch_future_pools_raw(use_supabase: bool, start_iso: Optional[str] = None, end_iso: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Future pools with members; cached briefly for live refresh, cleared by the mutators."""
+    # ISO strings compare chronologically, so both bounds are plain string comparisons
+    start = max(now_iso(), start_iso or "")
+    if use_supabase and SB is not None:
+        q = SB.table("pools").select("*").gte("when_iso", start)
+        if end_iso:
+            q = q.lte("when_iso", end_iso)
+        res = q.order("when_iso").execute()
         pools = res.data or []
         ids = [p.get("id") for p in pools]
         if ids:
@@ -277,29 +409,43 @@ def list_future_pools() -> List[Dict[str, Any]]:
         else:
             for p in pools:
                 p["members"] = []
+        for p in pools:
+            p["member_emails"] = {m["email"] for m in p["members"]}
         return pools
 
     # SQLite fallback
-    with get_conn() as con:
+    with reader_conn() as con:
         cur = con.cursor()
-        cur.execute("SELECT * FROM pools")
+        sql = (
+            "SELECT id, destination_id, destination_name, lat, lng, when_iso, seats, mode, notes, host_name, host_email, created_at, pickup "
+            "FROM pools WHERE when_iso >= ?"
+        )
+        params = [start]
+        if end_iso:
+            sql += " AND when_iso <= ?"
+            params.append(end_iso)
+        cur.execute(sql + " ORDER BY when_iso", params)
         rows = cur.fetchall()
         pools: List[Dict[str, Any]] = []
         for r in rows:
-            p = {
+            pools.append({
                 "id": r[0], "destination_id": r[1], "destination_name": r[2], "lat": r[3], "lng": r[4],
                 "when_iso": r[5], "seats": r[6], "mode": r[7], "notes": r[8],
                 "host_name": r[9], "host_email": r[10], "created_at": r[11],
-                "pickup": r[12] if len(r) > 12 else "",
-            }
-            try:
-                if datetime.fromisoformat(p["when_iso"]) >= datetime.now():
-                    pools.append(p)
-            except Exception:
-                continue
+                "pickup": r[12] or "",
+            })
+        # One members query for all pools instead of one per pool
+        by_pool: Dict[str, List[Dict[str, str]]] = {}
+        ids = [p["id"] for p in pools]
+        if ids:
+            marks = ",".join("?" * len(ids))
+            cur.execute(f"SELECT pool_id, name, email FROM members WHERE pool_id IN ({marks})", ids)
+            for (pid, n, e) in cur.fetchall():
+                by_pool.setdefault(pid, []).append({"name": n, "email": e})
         for p in pools:
-            cur.execute("SELECT name, email FROM members WHERE pool_id = ?", (p["id"],))
-            p["members"] = [{"name": n, "email": e} for (n, e) in cur.fetchall()]
+            p["members"] = by_pool.get(p["id"], [])
+            # Set for O(1) "already joined" checks in the list UI; members stays for display
+            p["member_emails"] = {m["email"] for m in p["members"]}
         return pools
 
 
@@ -307,7 +453,7 @@ def get_members_count(pool_id: str) -> int:
     if USE_SUPABASE and SB is not None:
         res = SB.table("members").select("pool_id").eq("pool_id", pool_id).execute()
         return len(res.data or [])
-    with get_conn() as con:
+    with reader_conn() as con:
         cur = con.cursor()
         cur.execute("SELECT COUNT(*) FROM members WHERE pool_id = ?", (pool_id,))
         return cur.fetchone()[0]
@@ -319,7 +465,10 @@ def join_pool(pool_id: str, name: str, email: str):
         try:
             rpc = SB.rpc("join_pool_atomic", {"p_pool_id": pool_id, "p_name": name, "p_email": email}).execute()
             if isinstance(rpc.data, bool):
-                return (True, "Joined") if rpc.data else (False, "Pool is full or ride passed")
+                if rpc.data:
+                    _fetch_future_pools_raw.clear()
+                    return True, "Joined"
+                return False, "Pool is full or ride passed"
         except Exception:
             pass
         # Fallback client-side checks
@@ -340,41 +489,53 @@ def join_pool(pool_id: str, name: str, email: str):
         if len(cnt.data or []) >= seats:
             return False, "Pool is full"
         SB.table("members").insert({"pool_id": pool_id, "name": name, "email": email}).execute()
+        _fetch_future_pools_raw.clear()
         return True, "Joined"
 
-    # SQLite fallback
-    with get_conn() as con:
+    # SQLite fallback: one conditional INSERT under a write lock, so two joiners can't overfill
+    now_s = now_iso()
+    with writer_conn() as con:
         cur = con.cursor()
-        cur.execute("SELECT 1 FROM members WHERE pool_id = ? AND email = ?", (pool_id, email))
-        if cur.fetchone():
-            return True, "Already joined"
-        cur.execute("SELECT seats, when_iso FROM pools WHERE id = ?", (pool_id,))
-        row = cur.fetchone()
-        if not row:
-            return False, "Pool not found"
-        seats, when_iso = row
+        cur.execute("BEGIN IMMEDIATE")
         try:
-            if datetime.fromisoformat(when_iso) < datetime.now():
+            cur.execute(
+                """
+                INSERT INTO members (pool_id, name, email)
+                SELECT ?, ?, ? FROM pools p
+                WHERE p.id = ? AND p.when_iso >= ?
+                  AND (SELECT COUNT(*) FROM members WHERE pool_id = p.id) < p.seats
+                """,
+                (pool_id, name, email, pool_id, now_s),
+            )
+        except sqlite3.IntegrityError:
+            return True, "Already joined"
+        if cur.rowcount != 1:
+            # Slow path only: work out why the insert was skipped
+            cur.execute("SELECT 1 FROM members WHERE pool_id = ? AND email = ?", (pool_id, email))
+            if cur.fetchone():
+                return True, "Already joined"
+            cur.execute("SELECT when_iso FROM pools WHERE id = ?", (pool_id,))
+            row = cur.fetchone()
+            if not row:
+                return False, "Pool not found"
+            if row[0] < now_s:
                 return False, "Ride time has passed"
-        except Exception:
-            pass
-        cur.execute("SELECT COUNT(*) FROM members WHERE pool_id = ?", (pool_id,))
-        count = cur.fetchone()[0]
-        if count >= seats:
             return False, "Pool is full"
-        cur.execute("INSERT INTO members VALUES (?, ?, ?)", (pool_id, name, email))
         con.commit()
-        return True, "Joined"
+    _fetch_future_pools_raw.clear()
+    return True, "Joined"
 
 
 def leave_pool(pool_id: str, email: str):
     if USE_SUPABASE and SB is not None:
         SB.table("members").delete().eq("pool_id", pool_id).eq("email", email).execute()
+        _fetch_future_pools_raw.clear()
         return
-    with get_conn() as con:
+    with writer_conn() as con:
         cur = con.cursor()
         cur.execute("DELETE FROM members WHERE pool_id = ? AND email = ?", (pool_id, email))
         con.commit()
+    _fetch_future_pools_raw.clear()
 
 
 def delete_pool(pool_id: str, requester_email: str) -> bool:
@@ -384,8 +545,9 @@ def delete_pool(pool_id: str, requester_email: str) -> bool:
             return False
         SB.table("members").delete().eq("pool_id", pool_id).execute()
         SB.table("pools").delete().eq("id", pool_id).execute()
+        _fetch_future_pools_raw.clear()
         return True
-    with get_conn() as con:
+    with writer_conn() as con:
         cur = con.cursor()
         cur.execute("SELECT host_email FROM pools WHERE id = ?", (pool_id,))
         row = cur.fetchone()
@@ -394,7 +556,8 @@ def delete_pool(pool_id: str, requester_email: str) -> bool:
         cur.execute("DELETE FROM members WHERE pool_id = ?", (pool_id,))
         cur.execute("DELETE FROM pools WHERE id = ?", (pool_id,))
         con.commit()
-        return True
+    _fetch_future_pools_raw.clear()
+    return True
 
 
 def cleanup_expired_pools():
@@ -405,17 +568,11 @@ def cleanup_expired_pools():
             SB.table("members").delete().in_("pool_id", old_ids).execute()
             SB.table("pools").delete().in_("id", old_ids).execute()
         return
-    now = datetime.now()
-    with get_conn() as con:
+    now_s = now_iso()
+    with writer_conn() as con:
         cur = con.cursor()
-        cur.execute("SELECT id, when_iso FROM pools")
-        for pid, when_iso in cur.fetchall():
-            try:
-                if datetime.fromisoformat(when_iso) < now:
-                    cur.execute("DELETE FROM members WHERE pool_id = ?", (pid,))
-                    cur.execute("DELETE FROM pools WHERE id = ?", (pid,))
-            except Exception:
-                continue
+        cur.execute("DELETE FROM members WHERE pool_id IN (SELECT id FROM pools WHERE when_iso < ?)", (now_s,))
+        cur.execute("DELETE FROM pools WHERE when_iso < ?", (now_s,))
         con.commit()
 
 # ---------------------------------
@@ -487,6 +644,7 @@ def google_sign_in_ui(cfg: Dict[str, str]):
                 st.sidebar.error(f"This app is restricted to @{allowed}")
                 return
             st.session_state.user = {"name": name, "email": email, "sub": idinfo.get("sub")}
+            st.session_state.pop("oauth_auth_url", None)
             # Clean URL params
             try:
                 if "code" in st.query_params:
@@ -500,14 +658,16 @@ def google_sign_in_ui(cfg: Dict[str, str]):
             st.sidebar.error(f"Google sign-in failed: {e}")
             return
 
-    # Show Sign-In button
+    # Show Sign-In button (URL built once per session, not on every rerun)
     try:
-        flow = make_flow()
-        auth_url, state = flow.authorization_url(
-            access_type="offline", include_granted_scopes="true", prompt="consent"
-        )
-        st.session_state["oauth_state"] = state
-        st.sidebar.link_button("Continue with Google", auth_url)
+        if "oauth_auth_url" not in st.session_state:
+            flow = make_flow()
+            auth_url, state = flow.authorization_url(
+                access_type="offline", include_granted_scopes="true", prompt="consent"
+            )
+            st.session_state["oauth_auth_url"] = auth_url
+            st.session_state["oauth_state"] = state
+        st.sidebar.link_button("Continue with Google", st.session_state["oauth_auth_url"])
     except Exception as e:
         st.sidebar.error(f"Google auth not ready: {e}")
         st.sidebar.caption("Check .streamlit/secrets.toml and OAuth redirect URI.")
@@ -595,7 +755,7 @@ def create_pool_ui(user: Dict[str, str]):
                 st.error(f"You can only create one pool every {COOLDOWN_MINUTES} minutes to prevent spam.")
             else:
                 pool = {
-                    "id": f"pool_{int(datetime.now().timestamp()*1000)}",
+                    "id": "pool_" + uuid.uuid4().hex,
                     "destination_id": dest.get("id") or dest["name"],
                     "destination_name": dest["name"],
                     "lat": dest["lat"],
@@ -620,10 +780,8 @@ def pools_list_ui(user: Dict[str, str]):
     cleanup_expired_pools()
     hero()
 
-    # Live updates via auto-refresh (fallback-friendly)
+    # Live updates (every 5s); see the fragment/autorefresh split at the end
     live = st.checkbox("🔄 Live updates (every 5s)", value=False)
-    if live and st_autorefresh is not None:
-        st_autorefresh(interval=5000, key="live_refresh")
 
     # Shared link focus (?pool=...)
     qp = st.query_params
@@ -635,9 +793,7 @@ def pools_list_ui(user: Dict[str, str]):
     elif isinstance(vals, str):
         focus_id = vals
 
-    pools = list_future_pools()
-
-    # Optional time filter (±15 min)
+    # Optional time filter (±15 min), applied in the query
     enable_time_filter = st.checkbox("Enable time filter (±15 min)", value=False)
     target_dt = None
     if enable_time_filter:
@@ -660,24 +816,50 @@ def pools_list_ui(user: Dict[str, str]):
             r = results[idx]
             target = {"lat": r["lat"], "lng": r["lng"]}
 
-    # If focus from share, bring it to top
+    if live and st_fragment is not None:
+        # Only the list re-runs every 5s; sidebar, create form and search above are left alone
+        st_fragment(run_every=5)(pools_list_body)(user, focus_id, target_dt, target)
+    else:
+        if live and st_autorefresh is not None:
+            st_autorefresh(interval=5000, key="live_refresh")
+        pools_list_body(user, focus_id, target_dt, target)
+
+
+def pools_list_body(
+    user: Dict[str, str],
+    focus_id: Optional[str],
+    target_dt: Optional[datetime],
+    target: Optional[Dict[str, float]],
+):
+    pools = list_future_pools(target_dt)
+
+    # Shared pool (?pool=...) is taken out first and pinned on top after sorting
     focus_pool = None
     if focus_id:
-        focus_pool = next((p for p in pools if p.get("id") == focus_id), None)
-        if focus_pool:
-            pools = [focus_pool] + [p for p in pools if p.get("id") != focus_pool.get("id")]
-
-    # Apply time filter
-    if enable_time_filter and target_dt:
-        pools = [p for p in pools if abs((datetime.fromisoformat(p["when_iso"]) - target_dt).total_seconds()) <= 900]
+        by_id = {p["id"]: p for p in pools}
+        focus_pool = by_id.pop(focus_id, None)
+        if focus_pool is not None:
+            pools = list(by_id.values())
 
     # Distance sorting if a target place selected
-    if target is not None:
+    if target is not None and np is not None and pools:
+        # One vectorized pass instead of a Python trig loop per pool
+        lat_rad, lng_rad = pool_coords_rad(pools)
+        d = haversine_km_many(target, lat_rad, lng_rad)
+        for p, km in zip(pools, d.tolist()):
+            p["distance_km"] = km
+        # Every pool stays listed, nearest first
+        pools = [pools[i] for i in np.argsort(d, kind="stable")]
+    elif target is not None:
         for p in pools:
             p["distance_km"] = haversine_km(target, {"lat": p["lat"], "lng": p["lng"]})
         pools.sort(key=lambda x: x.get("distance_km", float("inf")))
-    else:
-        pools.sort(key=lambda x: x["when_iso"])  # fallback: chronological
+    # else: already chronological (list_future_pools orders by when_iso)
+
+    if focus_pool is not None:
+        if target is not None:
+            focus_pool["distance_km"] = haversine_km(target, focus_pool)
+        pools = [focus_pool] + pools
 
     st.subheader("Available Pools")
     if not pools:
@@ -685,6 +867,8 @@ def pools_list_ui(user: Dict[str, str]):
         return
 
     for p in pools:
+        # Members were already loaded by list_future_pools; no per-row count query
+        member_count = len(p.get("members", []))
         cols = st.columns([5, 2, 2, 3])
         with cols[0]:
             title_lines = [f"**{p['destination_name']}**"]
@@ -700,19 +884,17 @@ def pools_list_ui(user: Dict[str, str]):
             if p.get("notes"):
                 st.write(p["notes"])
         with cols[1]:
-            member_count = get_members_count(p.get("id"))
             st.metric("Members", f"{member_count}/{p['seats']}")
         with cols[2]:
             if "distance_km" in p:
                 st.metric("Distance", f"{p['distance_km']:.1f} km")
         with cols[3]:
-            cur_count = get_members_count(p.get("id"))
-            already = any(m.get("email") == user["email"] for m in p.get("members", []))
+            already = user["email"] in p.get("member_emails", ())
             if already:
                 if st.button("Leave", key=f"leave_{p.get('id')}"):
                     leave_pool(p.get("id"), user["email"])
                     st.rerun()
-            elif cur_count < p["seats"]:
+            elif member_count < p["seats"]:
                 if st.button("Join", key=f"join_{p.get('id')}"):
                     ok, msg = join_pool(p.get("id"), user["name"], user["email"])
                     if ok:
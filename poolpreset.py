@@ -15,10 +15,17 @@ from __future__ import annotations
 
 import re
 import math
+import functools
 import sqlite3
+import threading
+import uuid
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Deque, Tuple
 
 import streamlit as st
 
@@ -54,6 +61,9 @@ except Exception:  # pragma: no cover
 # ---------------------------------
 st.set_page_config(page_title="BITS-H Pooler", page_icon="🚕", layout="wide")
 
+# Partial reruns (Streamlit >= 1.37; experimental name before that). None -> full-page reruns.
+st_fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None)
+
 # --- UI polish (pure CSS; no functional changes) ---
 def inject_css():
     st.markdown(
@@ -114,8 +124,8 @@ def inject_css():
           box-shadow: 0 6px 20px rgba(99,102,241,.25) !important;
         }
         .stButton > button:hover, .stLinkButton > a:hover { filter: brightness(1.06); }
-        /* Danger button */
-        .stButton:has(button[kind="secondary"]) > button {
+        /* Danger button (direct attribute match; :has() forces costly style recalcs) */
+        .stButton > button[kind="secondary"] {
           background: var(--danger) !important;
           box-shadow: 0 6px 20px rgba(239,68,68,.25) !important;
         }
@@ -139,6 +149,13 @@ def inject_css():
 DB_PATH = Path("pools.db")
 COOLDOWN_MINUTES = 15
 SEATS_MIN, SEATS_MAX = 1, 10
+CLEANUP_INTERVAL_S = 30
+CHAT_BUFFER = 200  # messages kept per pool in the session chat buffer
+CHAT_POLL_MIN_MS = 3000
+CHAT_POLL_MAX_MS = 15000
+CHAT_IDLE_POLLS = 3  # empty polls before the chat poll interval starts doubling
+ACT_QUIET_S = 10  # after a Join/Leave/Delete click, chat polls slow down for this long
+PAGE_SIZE = 20  # pool rows shown per "Load more" step
 
 # OAuth scopes
 SCOPES = [
@@ -147,8 +164,45 @@ SCOPES = [
     "https://www.googleapis.com/auth/userinfo.profile",
 ]
 
+
+@dataclass(frozen=True)
+class AppCfg:
+    """Secrets needed by the app, read once per process (see _load_cfg)."""
+    sb_url: Optional[str]
+    sb_key: Optional[str]
+    goog_id: Optional[str]
+    goog_sec: Optional[str]
+    goog_redir: str
+    goog_domain: str
+
+
+@st.cache_resource
+def _load_cfg() -> AppCfg:
+    # The script re-executes on every rerun, so cache the parsed secrets as a resource
+    sb: Dict[str, Any] = {}
+    goog: Dict[str, Any] = {}
+    try:
+        sb = dict(st.secrets.get("supabase", {}))
+    except Exception:
+        pass
+    try:
+        goog = dict(st.secrets.get("google_oauth", {}))
+    except Exception:
+        pass
+    return AppCfg(
+        sb_url=sb.get("url"),
+        sb_key=sb.get("anon_key"),
+        goog_id=goog.get("client_id"),
+        goog_sec=goog.get("client_secret"),
+        goog_redir=goog.get("redirect_uri", "http://localhost:8501"),
+        goog_domain=goog.get("allowed_domain", "hyderabad.bits-pilani.ac.in"),
+    )
+
+
+CFG = _load_cfg()
+
 # Fixed preset list for destination/pickup dropdowns (no Maps API required)
-DEST_PICKUP_CHOICES = [
+DEST_PICKUP_CHOICES: Tuple[str, ...] = (
     "JBS",
     "Viceroy family dhaba",
     "Taaza",
@@ -180,37 +234,64 @@ DEST_PICKUP_CHOICES = [
     "Sainikpuri",
     "JNTU",
     "Lakdi ka Pul",
-]
+)
+OTHER_PICKUP = "Other (type manually)"
+PICKUP_CHOICES_WITH_OTHER = DEST_PICKUP_CHOICES + (OTHER_PICKUP,)
 
 # ---------------------------------
 # Utilities
 # ---------------------------------
 
+_BITS_RE = re.compile(r"@hyderabad\.bits-pilani\.ac\.in$", re.IGNORECASE)
+_SLUG_RE = re.compile(r"[^a-z0-9]+")
+
+
 def is_bits_email(email: str) -> bool:
-    return bool(re.search(r"@hyderabad\.bits-pilani\.ac\.in$", email.strip(), re.IGNORECASE))
+    return bool(_BITS_RE.search(email.strip()))
 
 
 def now_iso() -> str:
     return datetime.now().isoformat()
 
 
+@functools.lru_cache(maxsize=4096)
+def _fmt_when(when_iso: str) -> str:
+    """Display form of a stored ISO timestamp (when_iso never changes for a pool)."""
+    return datetime.fromisoformat(when_iso).strftime("%d %b %Y, %I:%M %p")
+
+
+def throttled(key: str, interval: float, fn):
+    """Run fn at most once per `interval` seconds per session; in between, return its last result."""
+    now = time.monotonic()
+    if now - st.session_state.get(key, float("-inf")) < interval:
+        return st.session_state.get(key + "_val")
+    val = fn()
+    st.session_state[key] = now
+    st.session_state[key + "_val"] = val
+    return val
+
+
 def _slug(s: str) -> str:
     """Slugify a name for destination_id/pickup ids without external deps."""
-    return re.sub(r"[^a-z0-9]+", "_", s.lower()).strip("_")
+    return _SLUG_RE.sub("_", s.lower()).strip("_")
+
+
+DEST_SLUGS = {n: _slug(n) for n in DEST_PICKUP_CHOICES}
 
 
 def haversine_km(a: Dict[str, float], b: Dict[str, float]) -> float:
     if not a or not b:
         return float("inf")
     R = 6371.0
-    lat1, lon1 = math.radians(a["lat"]), math.radians(a["lng"]) if a else (0.0, 0.0)
-    lat2, lon2 = math.radians(b["lat"]), math.radians(b["lng"]) if b else (0.0, 0.0)
+    lat1, lon1 = math.radians(a["lat"]), math.radians(a["lng"])
+    lat2, lon2 = math.radians(b["lat"]), math.radians(b["lng"])
     dlat = lat2 - lat1
     dlon = lon2 - lon1
     x = math.sin(dlat / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon / 2) ** 2
     c = 2 * math.atan2(math.sqrt(x), math.sqrt(1 - x))
     return R * c
 
+
 # ---------------------------------
 # Data layer (Supabase or SQLite)
 # ---------------------------------
@@ -219,19 +300,35 @@ USE_SUPABASE = False
 
 
 def get_supabase_cfg() -> Optional[Dict[str, str]]:
-    try:
-        cfg = st.secrets["supabase"]
-        url = cfg.get("url")
-        key = cfg.get("anon_key")
-        if url and key:
-            return {"url": url, "anon_key": key}
-    except Exception:
-        pass
+    if CFG.sb_url and CFG.sb_key:
+        return {"url": CFG.sb_url, "anon_key": CFG.sb_key}
     return None
 
 
+@st.cache_resource
 def get_conn():
-    return sqlite3.connect(DB_PATH, check_same_thread=False)
+    """One long-lived WAL connection shared across reruns/sessions (page cache stays warm)."""
+    con = sqlite3.connect(DB_PATH, check_same_thread=False)
+    con.row_factory = sqlite3.Row
+    con.executescript(
+        """
+        PRAGMA journal_mode=WAL;
+        PRAGMA synchronous=NORMAL;
+        PRAGMA temp_store=MEMORY;
+        PRAGMA mmap_size=268435456;
+        PRAGMA cache_size=-20000;
+        PRAGMA foreign_keys=ON;
+        """
+    )
+    return con, threading.Lock()
+
+
+@contextmanager
+def db_conn():
+    """Use the shared connection; commits on success, rolls back on error."""
+    con, lock = get_conn()
+    with lock, con:
+        yield con
 
 
 def init_db():
@@ -239,15 +336,26 @@ def init_db():
     sb_cfg = get_supabase_cfg()
     if sb_cfg and create_client is not None:
         try:
-            SB = create_client(sb_cfg["url"], sb_cfg["anon_key"])  # type: ignore
+            SB = _supabase_client(sb_cfg["url"], sb_cfg["anon_key"])
             USE_SUPABASE = True
             return
         except Exception as e:
             st.sidebar.warning(f"Supabase disabled: {e}. Falling back to SQLite.")
             USE_SUPABASE = False
 
-    # SQLite fallback schema
-    with get_conn() as con:
+    _init_sqlite_schema()
+
+
+@st.cache_resource
+def _supabase_client(url: str, key: str) -> Client:
+    # One client per process, so its HTTP connection pool is reused across reruns
+    return create_client(url, key)  # type: ignore
+
+
+@st.cache_resource
+def _init_sqlite_schema():
+    """SQLite fallback schema; runs once per process instead of on every rerun."""
+    with db_conn() as con:
         cur = con.cursor()
         cur.execute(
             """
@@ -271,7 +379,7 @@ def init_db():
         cur.execute(
             """
             CREATE TABLE IF NOT EXISTS members (
-                pool_id TEXT,
+                pool_id TEXT REFERENCES pools(id) ON DELETE CASCADE,
                 name TEXT,
                 email TEXT,
                 UNIQUE(pool_id, email)
@@ -291,6 +399,17 @@ def init_db():
             )
             """
         )
+        # Indexes for hot lookups. members(pool_id) and members(pool_id, email) are
+        # already served by the UNIQUE(pool_id, email) autoindex.
+        cur.executescript(
+            """
+            CREATE INDEX IF NOT EXISTS idx_pools_host_created ON pools(host_email, created_at);
+            CREATE INDEX IF NOT EXISTS idx_pools_when ON pools(when_iso);
+            CREATE INDEX IF NOT EXISTS idx_messages_pool_created ON messages(pool_id, created_at);
+            """
+        )
+        # Refresh planner stats where they are missing or stale; runs once per process
+        cur.execute("PRAGMA optimize")
         con.commit()
 
 # Spam guard --------------------------------------------------------------
@@ -311,23 +430,107 @@ def can_host_create(email: str) -> bool:
             return not (res.data and len(res.data) > 0)
         except Exception:
             return True
-    with get_conn() as con:
+    with db_conn() as con:
         cur = con.cursor()
         try:
-            cur.execute("SELECT created_at FROM pools WHERE host_email = ?", (email,))
-            rows = cur.fetchall()
-            for (created_at,) in rows:
-                try:
-                    if datetime.fromisoformat(created_at) >= since:
-                        return False
-                except Exception:
-                    continue
+            # created_at is ISO-8601, so string comparison is chronological
+            cur.execute(
+                "SELECT 1 FROM pools WHERE host_email = ? AND created_at >= ? LIMIT 1",
+                (email, since.isoformat()),
+            )
+            return cur.fetchone() is None
         except Exception:
             return True
-    return True
+
+# Read caches ---------------------------------------------------------------
+# Reruns happen on every widget event. The pool index lives in one process-wide
+# store shared by all sessions; mutators invalidate it and bump its version, and
+# the derived per-filter/per-card caches are keyed on that version.
+
+POOLS_TTL_S = 5  # reload the shared index at least this often (other writers)
+
+
+@st.cache_resource
+def _pool_store() -> Dict[str, Any]:
+    return {"lock": threading.Lock(), "index": None, "ver": 0, "loaded": 0.0}
+
+
+def pools_version() -> int:
+    return _pool_store()["ver"]
+
+
+def _build_pool_index() -> Dict[str, Any]:
+    """Future pools plus lowercase destination/pickup buckets, built once per fetch."""
+    pools = list_future_pools()
+    by_dest: Dict[str, List[Dict[str, Any]]] = {}
+    by_pickup: Dict[str, List[Dict[str, Any]]] = {}
+    for p in pools:
+        p["_when_display"] = _fmt_when(p["when_iso"])
+        p["_dest_lc"] = (p.get("destination_name") or "").strip().lower()
+        p["_pickup_lc"] = (p.get("pickup") or "").strip().lower()
+        by_dest.setdefault(p["_dest_lc"], []).append(p)
+        by_pickup.setdefault(p["_pickup_lc"], []).append(p)
+    return {"pools": pools, "by_dest": by_dest, "by_pickup": by_pickup}
+
+
+def pool_index() -> Dict[str, Any]:
+    """Shared pool index; read-only for callers. One loader at a time under the store lock."""
+    store = _pool_store()
+    with store["lock"]:
+        if store["index"] is None or time.monotonic() - store["loaded"] > POOLS_TTL_S:
+            store["index"] = _build_pool_index()
+            store["loaded"] = time.monotonic()
+        return store["index"]
+
+
+@st.cache_data(ttl=5, show_spinner=False)
+def filtered_pools_cached(
+    version: int, dest: Optional[str], pickup: Optional[str], day: Optional[str]
+) -> List[Dict[str, Any]]:
+    """Future pools narrowed by the list filters, sorted by time; None skips a filter."""
+    idx = pool_index()
+    pools = idx["pools"]
+    if dest:
+        pools = idx["by_dest"].get(dest.strip().lower(), [])
+    if pickup:
+        pk = pickup.strip().lower()
+        pools = [p for p in pools if p["_pickup_lc"] == pk] if dest else idx["by_pickup"].get(pk, [])
+    if day:
+        pools = [p for p in pools if p["when_iso"][:10] == day]
+    return sorted(pools, key=lambda x: x["when_iso"])
+
+
+@st.cache_data(ttl=5, show_spinner=False)
+def membership_bulk_cached(version: int, pids: Tuple[str, ...], email: str) -> Dict[str, Tuple[int, bool]]:
+    return get_pool_membership_bulk(list(pids), email)
+
+
+@st.cache_data(ttl=5, show_spinner=False)
+def member_lists_cached(version: int, pids: Tuple[str, ...]) -> Dict[str, List[Dict[str, str]]]:
+    return get_member_lists_bulk(list(pids))
+
+
+def bump_pools_version():
+    """Drop the shared index; the new version also misses every version-keyed cache."""
+    store = _pool_store()
+    with store["lock"]:
+        store["index"] = None
+        store["ver"] += 1
+
+
+def invalidates_pools(fn):
+    """Decorator for pool/member mutators: cached pool lists are stale afterwards."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            bump_pools_version()
+    return wrapper
 
 # Core DB functions -------------------------------------------------------
 
+@invalidates_pools
 def add_pool(pool: Dict[str, Any]):
     if USE_SUPABASE and SB is not None:
         # Let DB generate UUID and return it
@@ -351,7 +554,7 @@ def add_pool(pool: Dict[str, Any]):
         return
 
     # SQLite fallback
-    with get_conn() as con:
+    with db_conn() as con:
         cur = con.cursor()
         cur.execute(
             "INSERT INTO pools (id, destination_id, destination_name, lat, lng, when_iso, seats, mode, notes, host_name, host_email, created_at, pickup) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
@@ -377,7 +580,13 @@ def add_pool(pool: Dict[str, Any]):
 
 def list_future_pools() -> List[Dict[str, Any]]:
     if USE_SUPABASE and SB is not None:
-        res = SB.table("pools").select("*").gte("when_iso", now_iso()).execute()
+        # Only the columns the presets UI shows (lat/lng are always 0.0 here)
+        res = (
+            SB.table("pools")
+            .select("id,destination_name,when_iso,seats,mode,notes,host_name,host_email,pickup")
+            .gte("when_iso", now_iso())
+            .execute()
+        )
         pools = res.data or []
         ids = [p.get("id") for p in pools]
         if ids:
@@ -393,35 +602,27 @@ def list_future_pools() -> List[Dict[str, Any]]:
         return pools
 
     # SQLite fallback
-    with get_conn() as con:
+    with db_conn() as con:
         cur = con.cursor()
-        cur.execute("SELECT * FROM pools")
-        rows = cur.fetchall()
-        pools: List[Dict[str, Any]] = []
-        for r in rows:
-            p = {
-                "id": r[0],
-                "destination_id": r[1],
-                "destination_name": r[2],
-                "lat": r[3],
-                "lng": r[4],
-                "when_iso": r[5],
-                "seats": r[6],
-                "mode": r[7],
-                "notes": r[8],
-                "host_name": r[9],
-                "host_email": r[10],
-                "created_at": r[11],
-                "pickup": r[12] if len(r) > 12 else "",
-            }
-            try:
-                if datetime.fromisoformat(p["when_iso"]) >= datetime.now():
-                    pools.append(p)
-            except Exception:
-                continue
+        # ISO strings compare chronologically, same as the Supabase .gte() above
+        pools: List[Dict[str, Any]] = [
+            dict(r)
+            for r in cur.execute(
+                "SELECT id, destination_id, destination_name, lat, lng, when_iso, seats, mode, notes, "
+                "host_name, host_email, created_at, COALESCE(pickup, '') AS pickup "
+                "FROM pools WHERE when_iso >= ?",
+                (now_iso(),),
+            )
+        ]
+        # One members query for all pools instead of one per pool
+        by_pool: Dict[str, List[Dict[str, str]]] = {}
+        ids = [p["id"] for p in pools]
+        if ids:
+            marks = ",".join("?" * len(ids))
+            for r in cur.execute(f"SELECT pool_id, name, email FROM members WHERE pool_id IN ({marks})", ids):
+                by_pool.setdefault(r["pool_id"], []).append({"name": r["name"], "email": r["email"]})
         for p in pools:
-            cur.execute("SELECT name, email FROM members WHERE pool_id = ?", (p["id"],))
-            p["members"] = [{"name": n, "email": e} for (n, e) in cur.fetchall()]
+            p["members"] = by_pool.get(p["id"], [])
         return pools
 
 
@@ -432,22 +633,85 @@ def get_member_list(pool_id: str) -> List[Dict[str, str]]:
             return res.data or []
         except Exception:
             return []
-    with get_conn() as con:
+    with db_conn() as con:
+        cur = con.cursor()
+        return [dict(r) for r in cur.execute("SELECT name, email FROM members WHERE pool_id = ?", (pool_id,))]
+
+
+def get_member_lists_bulk(pids: List[str]) -> Dict[str, List[Dict[str, str]]]:
+    """{pool_id: [{name, email}, ...]} for all pids in one query."""
+    out: Dict[str, List[Dict[str, str]]] = {pid: [] for pid in pids}
+    if not pids:
+        return out
+    if USE_SUPABASE and SB is not None:
+        try:
+            res = (
+                SB.table("members")
+                .select("pool_id,name,email")
+                .in_("pool_id", list(pids))
+                .order("joined_at", desc=False)
+                .execute()
+            )
+        except Exception:
+            return out
+        for m in (res.data or []):
+            out.setdefault(m["pool_id"], []).append({"name": m["name"], "email": m["email"]})
+        return out
+    with db_conn() as con:
         cur = con.cursor()
-        cur.execute("SELECT name, email FROM members WHERE pool_id = ?", (pool_id,))
-        return [{"name": n, "email": e} for (n, e) in cur.fetchall()]
+        _load_pid_batch(cur, pids)
+        for r in cur.execute(
+            "SELECT m.pool_id, m.name, m.email FROM members m JOIN pid_batch b ON b.id = m.pool_id"
+        ):
+            out[r["pool_id"]].append({"name": r["name"], "email": r["email"]})
+    return out
 
 
 def get_members_count(pool_id: str) -> int:
     if USE_SUPABASE and SB is not None:
-        res = SB.table("members").select("pool_id").eq("pool_id", pool_id).execute()
-        return len(res.data or [])
-    with get_conn() as con:
+        # head=True: count header only, no row payload
+        res = SB.table("members").select("pool_id", count="exact", head=True).eq("pool_id", pool_id).execute()
+        return res.count or 0
+    with db_conn() as con:
         cur = con.cursor()
         cur.execute("SELECT COUNT(*) FROM members WHERE pool_id = ?", (pool_id,))
         return cur.fetchone()[0]
 
 
+def _load_pid_batch(cur: sqlite3.Cursor, pids: List[str]):
+    """Fill the connection's TEMP pid_batch table so bulk reads JOIN it: constant SQL
+    text (statement cache hits) and no bound-parameter limit, unlike IN (?, ?, ...)."""
+    cur.execute("CREATE TEMP TABLE IF NOT EXISTS pid_batch (id TEXT PRIMARY KEY)")
+    cur.execute("DELETE FROM pid_batch")
+    cur.executemany("INSERT OR IGNORE INTO pid_batch VALUES (?)", [(pid,) for pid in pids])
+
+
+def get_pool_membership_bulk(pids: List[str], email: str) -> Dict[str, Tuple[int, bool]]:
+    """{pool_id: (member_count, email_is_member)} for all pids in one query."""
+    out: Dict[str, Tuple[int, bool]] = {pid: (0, False) for pid in pids}
+    if not pids:
+        return out
+    if USE_SUPABASE and SB is not None:
+        try:
+            res = SB.table("members").select("pool_id,email").in_("pool_id", list(pids)).execute()
+        except Exception:
+            return out
+        for m in (res.data or []):
+            cnt, mine = out.get(m["pool_id"], (0, False))
+            out[m["pool_id"]] = (cnt + 1, mine or m.get("email") == email)
+        return out
+    with db_conn() as con:
+        cur = con.cursor()
+        _load_pid_batch(cur, pids)
+        for r in cur.execute(
+            "SELECT m.pool_id, COUNT(*), MAX(m.email = ?) FROM members m "
+            "JOIN pid_batch b ON b.id = m.pool_id GROUP BY m.pool_id",
+            (email,),
+        ):
+            out[r[0]] = (r[1], bool(r[2]))
+    return out
+
+
 def is_user_member(pool_id: str, email: str) -> bool:
     if USE_SUPABASE and SB is not None:
         try:
@@ -455,12 +719,13 @@ def is_user_member(pool_id: str, email: str) -> bool:
             return bool(res.data)
         except Exception:
             return False
-    with get_conn() as con:
+    with db_conn() as con:
         cur = con.cursor()
         cur.execute("SELECT 1 FROM members WHERE pool_id = ? AND email = ?", (pool_id, email))
         return cur.fetchone() is not None
 
 
+@invalidates_pools
 def join_pool(pool_id: str, name: str, email: str):
     if USE_SUPABASE and SB is not None:
         # Try atomic RPC if present
@@ -478,43 +743,46 @@ def join_pool(pool_id: str, name: str, email: str):
         if not pres.data:
             return False, "Pool not found"
         seats = pres.data[0]["seats"]
-        when_iso = pres.data[0]["when_iso"]
-        try:
-            if datetime.fromisoformat(when_iso) < datetime.now():
-                return False, "Ride time has passed"
-        except Exception:
-            pass
-        cnt = SB.table("members").select("pool_id").eq("pool_id", pool_id).execute()
-        if len(cnt.data or []) >= seats:
+        if (pres.data[0]["when_iso"] or "") < now_iso():
+            return False, "Ride time has passed"
+        cnt = SB.table("members").select("pool_id", count="exact", head=True).eq("pool_id", pool_id).execute()
+        if (cnt.count or 0) >= seats:
             return False, "Pool is full"
         SB.table("members").insert({"pool_id": pool_id, "name": name, "email": email}).execute()
         return True, "Joined"
 
-    # SQLite fallback
-    with get_conn() as con:
+    # SQLite fallback: one guarded INSERT; BEGIN IMMEDIATE takes the write lock up front
+    now_s = now_iso()
+    with db_conn() as con:
         cur = con.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        cur.execute(
+            """
+            INSERT INTO members (pool_id, name, email)
+            SELECT ?, ?, ? FROM pools p
+            WHERE p.id = ? AND p.when_iso >= ?
+              AND (SELECT COUNT(*) FROM members WHERE pool_id = ?) < p.seats
+              AND NOT EXISTS (SELECT 1 FROM members WHERE pool_id = ? AND email = ?)
+            """,
+            (pool_id, name, email, pool_id, now_s, pool_id, pool_id, email),
+        )
+        if cur.rowcount == 1:
+            con.commit()
+            return True, "Joined"
+        # Nothing inserted: classify why
         cur.execute("SELECT 1 FROM members WHERE pool_id = ? AND email = ?", (pool_id, email))
         if cur.fetchone():
             return True, "Already joined"
-        cur.execute("SELECT seats, when_iso FROM pools WHERE id = ?", (pool_id,))
+        cur.execute("SELECT when_iso FROM pools WHERE id = ?", (pool_id,))
         row = cur.fetchone()
         if not row:
             return False, "Pool not found"
-        seats, when_iso = row
-        try:
-            if datetime.fromisoformat(when_iso) < datetime.now():
-                return False, "Ride time has passed"
-        except Exception:
-            pass
-        cur.execute("SELECT COUNT(*) FROM members WHERE pool_id = ?", (pool_id,))
-        count = cur.fetchone()[0]
-        if count >= seats:
-            return False, "Pool is full"
-        cur.execute("INSERT INTO members VALUES (?, ?, ?)", (pool_id, name, email))
-        con.commit()
-        return True, "Joined"
+        if row[0] < now_s:
+            return False, "Ride time has passed"
+        return False, "Pool is full"
 
 
+@invalidates_pools
 def leave_pool(pool_id: str, email: str):
     """Remove the user from a pool's members list.
     With Supabase+RLS, prefer a SECURITY DEFINER RPC (leave_pool_if_member).
@@ -535,12 +803,13 @@ def leave_pool(pool_id: str, email: str):
             return
 
     # SQLite fallback
-    with get_conn() as con:
+    with db_conn() as con:
         cur = con.cursor()
         cur.execute("DELETE FROM members WHERE pool_id = ? AND email = ?", (pool_id, email))
         con.commit()
 
 
+@invalidates_pools
 def delete_pool(pool_id: str, requester_email: str) -> bool:
     """Delete pool if requester is the host.
     Supabase: prefer RPC `delete_pool_if_host` (SECURITY DEFINER) to bypass RLS safely.
@@ -556,25 +825,26 @@ def delete_pool(pool_id: str, requester_email: str) -> bool:
                 return True
         except Exception:
             pass
-        # 2) Fallback pre-check + direct delete (may be blocked by RLS)
+        # 2) Fallback: one host-scoped delete (may be blocked by RLS)
         try:
-            res = SB.table("pools").select("host_email").eq("id", pool_id).execute()
-            if not res.data or res.data[0].get("host_email") != requester_email:
-                return False
-            dres = SB.table("pools").delete().eq("id", pool_id).execute()
-            return bool(getattr(dres, "data", None))
+            dres = (
+                SB.table("pools")
+                .delete(count="exact")
+                .eq("id", pool_id)
+                .eq("host_email", requester_email)
+                .execute()
+            )
+            return (dres.count or 0) > 0
         except Exception:
             return False
 
-    # SQLite fallback
-    with get_conn() as con:
+    # SQLite fallback: host check folded into the DELETE
+    with db_conn() as con:
         cur = con.cursor()
-        cur.execute("SELECT host_email FROM pools WHERE id = ?", (pool_id,))
-        row = cur.fetchone()
-        if not row or row[0] != requester_email:
+        cur.execute("DELETE FROM pools WHERE id = ? AND host_email = ?", (pool_id, requester_email))
+        if cur.rowcount == 0:
             return False
         cur.execute("DELETE FROM members WHERE pool_id = ?", (pool_id,))
-        cur.execute("DELETE FROM pools WHERE id = ?", (pool_id,))
         con.commit()
         return True
 
@@ -591,60 +861,113 @@ def cleanup_expired_pools():
             if ids:
                 SB.table("members").delete().in_("pool_id", ids).execute()
                 SB.table("pools").delete().in_("id", ids).execute()
+                bump_pools_version()
         except Exception:
             # Ignore cleanup failures; UI will still function
             pass
         return
 
-    now = datetime.now()
-    with get_conn() as con:
+    now_s = now_iso()
+    with db_conn() as con:
         cur = con.cursor()
-        cur.execute("SELECT id, when_iso FROM pools")
-        for pid, when_iso in cur.fetchall():
-            try:
-                if datetime.fromisoformat(when_iso) < now:
-                    cur.execute("DELETE FROM members WHERE pool_id = ?", (pid,))
-                    cur.execute("DELETE FROM pools WHERE id = ?", (pid,))
-            except Exception:
-                continue
+        # Members first: databases created before the ON DELETE CASCADE schema don't cascade
+        cur.execute("DELETE FROM members WHERE pool_id IN (SELECT id FROM pools WHERE when_iso < ?)", (now_s,))
+        cur.execute("DELETE FROM pools WHERE when_iso < ?", (now_s,))
+        removed = cur.rowcount > 0
         con.commit()
+    # Runs on every page load, so only invalidate when something was actually removed
+    if removed:
+        bump_pools_version()
 
 # -----------------------
 # Chat (messages) helpers
 # -----------------------
 
-def list_messages(pool_id: str, limit: int = 200) -> List[Dict[str, Any]]:
+def list_messages_tail(pool_id: str, n: int = CHAT_BUFFER) -> List[Dict[str, Any]]:
+    """The newest n messages of a pool, oldest first; the LIMIT is applied in the query."""
+    if USE_SUPABASE and SB is not None:
+        try:
+            res = (
+                SB.table("messages")
+                .select("id,pool_id,sender_email,sender_name,content,created_at")
+                .eq("pool_id", pool_id)
+                .order("created_at", desc=True)
+                .limit(n)
+                .execute()
+            )
+            return list(reversed(res.data or []))
+        except Exception:
+            return []
+    with db_conn() as con:
+        cur = con.cursor()
+        cur.execute(
+            "SELECT id,pool_id,sender_email,sender_name,content,created_at FROM messages WHERE pool_id = ? ORDER BY created_at DESC LIMIT ?",
+            (pool_id, n),
+        )
+        return [dict(r) for r in reversed(cur.fetchall())]
+
+
+@st.cache_data(ttl=2, show_spinner=False)
+def _cached_tail(pool_id: str, n: int) -> List[Dict[str, Any]]:
+    # Sessions opening the same chat within 2s share one read; add_message clears it
+    return list_messages_tail(pool_id, n)
+
+
+def list_messages_since(pool_id: str, since_iso: str, limit: int = 200) -> List[Dict[str, Any]]:
+    """Messages newer than since_iso (oldest first); at most the newest `limit` of them."""
     if USE_SUPABASE and SB is not None:
         try:
             res = (
                 SB.table("messages")
                 .select("id,pool_id,sender_email,sender_name,content,created_at")
                 .eq("pool_id", pool_id)
-                .order("created_at", desc=False)
+                .gt("created_at", since_iso)
+                .order("created_at", desc=True)
                 .limit(limit)
                 .execute()
             )
-            return res.data or []
+            return list(reversed(res.data or []))
         except Exception:
             return []
-    with get_conn() as con:
+    with db_conn() as con:
         cur = con.cursor()
         cur.execute(
-            "SELECT id,pool_id,sender_email,sender_name,content,created_at FROM messages WHERE pool_id = ? ORDER BY created_at ASC LIMIT ?",
-            (pool_id, limit),
+            "SELECT id,pool_id,sender_email,sender_name,content,created_at FROM messages WHERE pool_id = ? AND created_at > ? ORDER BY created_at DESC LIMIT ?",
+            (pool_id, since_iso, limit),
         )
-        rows = cur.fetchall()
-        return [
-            {
-                "id": r[0],
-                "pool_id": r[1],
-                "sender_email": r[2],
-                "sender_name": r[3],
-                "content": r[4],
-                "created_at": r[5],
-            }
-            for r in rows
-        ]
+        return [dict(r) for r in reversed(cur.fetchall())]
+
+
+def _chat_buf(pool_id: str) -> Dict[str, Any]:
+    return st.session_state.setdefault(
+        f"msgs_{pool_id}", {"last_ts": "", "idle": 0, "rows": deque(maxlen=CHAT_BUFFER)}
+    )
+
+
+def chat_messages(pool_id: str) -> Deque[Dict[str, Any]]:
+    """Per-session ring buffer of a pool's last CHAT_BUFFER messages; each call fetches only newer rows."""
+    buf = _chat_buf(pool_id)
+    if buf["last_ts"]:
+        new = list_messages_since(pool_id, buf["last_ts"], CHAT_BUFFER)
+    else:
+        new = _cached_tail(pool_id, CHAT_BUFFER)
+    if new:
+        buf["rows"].extend(new)
+        buf["last_ts"] = new[-1]["created_at"]
+        buf["idle"] = 0
+    else:
+        buf["idle"] += 1
+    return buf["rows"]
+
+
+def chat_poll_ms(pool_id: str) -> int:
+    """Poll interval for a chat: CHAT_POLL_MIN_MS while active, doubling up to CHAT_POLL_MAX_MS when idle."""
+    if time.monotonic() - st.session_state.get("_last_act", 0.0) < ACT_QUIET_S:
+        return CHAT_POLL_MAX_MS  # the click already reran the card; don't pile polls on top
+    extra = _chat_buf(pool_id)["idle"] - CHAT_IDLE_POLLS
+    if extra < 0:
+        return CHAT_POLL_MIN_MS
+    return min(CHAT_POLL_MAX_MS, CHAT_POLL_MIN_MS << min(extra + 1, 8))
 
 
 def add_message(pool_id: str, sender_name: str, sender_email: str, content: str):
@@ -660,38 +983,32 @@ def add_message(pool_id: str, sender_name: str, sender_email: str, content: str)
                     "created_at": ts,
                 }
             ).execute()
+            _cached_tail.clear()
             return
         except Exception:
             return
-    with get_conn() as con:
+    with db_conn() as con:
         cur = con.cursor()
-        mid = f"msg_{int(datetime.now().timestamp()*1000)}"
+        mid = "msg_" + uuid.uuid4().hex
         cur.execute(
             "INSERT INTO messages (id,pool_id,sender_email,sender_name,content,created_at) VALUES (?,?,?,?,?,?)",
             (mid, pool_id, sender_email, sender_name, content, ts),
         )
         con.commit()
+    _cached_tail.clear()
 
 # ---------------------------------
 # Google OAuth helpers
 # ---------------------------------
 
 def get_google_oauth_cfg() -> Optional[Dict[str, str]]:
-    try:
-        cfg = st.secrets.get("google_oauth", {})
-        cid = cfg.get("client_id")
-        csec = cfg.get("client_secret")
-        redir = cfg.get("redirect_uri", "http://localhost:8501")
-        domain = cfg.get("allowed_domain", "hyderabad.bits-pilani.ac.in")
-        if cid and csec:
-            return {
-                "client_id": cid,
-                "client_secret": csec,
-                "redirect_uri": redir,
-                "allowed_domain": domain,
-            }
-    except Exception:
-        pass
+    if CFG.goog_id and CFG.goog_sec:
+        return {
+            "client_id": CFG.goog_id,
+            "client_secret": CFG.goog_sec,
+            "redirect_uri": CFG.goog_redir,
+            "allowed_domain": CFG.goog_domain,
+        }
     return None
 
 
@@ -796,7 +1113,7 @@ def email_gate():
 def create_pool_ui(user: Dict[str, str]):
     with st.expander("➕ Create your own pool", expanded=False):
         dest_name = st.selectbox("Destination", DEST_PICKUP_CHOICES, index=0)
-        dest = {"id": _slug(dest_name), "name": dest_name, "lat": 0.0, "lng": 0.0}
+        dest = {"id": DEST_SLUGS[dest_name], "name": dest_name, "lat": 0.0, "lng": 0.0}
 
         col1, col2 = st.columns([2, 1])
         with col1:
@@ -808,10 +1125,10 @@ def create_pool_ui(user: Dict[str, str]):
         with col2:
             pickup_choice = st.selectbox(
                 "Pickup point",
-                DEST_PICKUP_CHOICES + ["Other (type manually)"],
+                PICKUP_CHOICES_WITH_OTHER,
                 index=0,
             )
-            if pickup_choice == "Other (type manually)":
+            if pickup_choice == OTHER_PICKUP:
                 pickup = st.text_input("Pickup (custom)", placeholder="Enter pickup point")
             else:
                 pickup = pickup_choice
@@ -828,7 +1145,7 @@ def create_pool_ui(user: Dict[str, str]):
                 st.error(f"You can only create one pool every {COOLDOWN_MINUTES} minutes to prevent spam.")
             else:
                 pool = {
-                    "id": f"pool_{int(datetime.now().timestamp()*1000)}",
+                    "id": "pool_" + uuid.uuid4().hex,
                     "destination_id": dest["id"],
                     "destination_name": dest["name"],
                     "lat": dest["lat"],
@@ -848,83 +1165,60 @@ def create_pool_ui(user: Dict[str, str]):
 
 # List UI -----------------------------------------------------------------
 
+def _extract_focus(vals: Any) -> Optional[str]:
+    """Pool id from a ?pool= query value (a str, or a list on older Streamlit)."""
+    if isinstance(vals, list):
+        return vals[0] if vals else None
+    return vals if isinstance(vals, str) else None
+
+
 def pools_list_ui(user: Dict[str, str]):
-    cleanup_expired_pools()
+    throttled("_last_cleanup", CLEANUP_INTERVAL_S, cleanup_expired_pools)
     hero()
     # Live updates removed
     live = False  # kept as a placeholder to avoid NameError in older blocks
-# Shared link focus (?pool=...)
-    qp = st.query_params
-    focus_id: Optional[str] = None
-    vals = qp.get("pool")
-    if isinstance(vals, list):
-        if vals:
-            focus_id = vals[0]
-    elif isinstance(vals, str):
-        focus_id = vals
-
-    pools = list_future_pools()
-
-    # If a pool was just deleted, hide it immediately before rendering
-    _prune = st.session_state.pop("_deleted_pool_id", None)
-    if _prune:
-        pools = [p for p in pools if p.get("id") != _prune]
+    # Shared link focus (?pool=...), re-parsed only when the param changes
+    raw = st.query_params.get("pool")
+    if "_focus_id" not in st.session_state or st.session_state.get("_focus_raw") != raw:
+        st.session_state["_focus_raw"] = raw
+        st.session_state["_focus_id"] = _extract_focus(raw)
+    focus_id: Optional[str] = st.session_state["_focus_id"]
 
     # Destination & pickup filters (dropdowns)
     st.subheader("Find pools by destination")
     dest_choice = st.selectbox(
         "Filter by destination",
-        ["All destinations"] + DEST_PICKUP_CHOICES,
+        ("All destinations",) + DEST_PICKUP_CHOICES,
         index=0,
         key="dest_filter",
     )
-    if dest_choice != "All destinations":
-        pools = [
-            p for p in pools
-            if (p.get("destination_name") or "").strip().lower() == dest_choice.strip().lower()
-        ]
-
     pickup_choice = st.selectbox(
         "Optional: filter by pickup point",
-        ["Any pickup"] + DEST_PICKUP_CHOICES,
+        ("Any pickup",) + DEST_PICKUP_CHOICES,
         index=0,
         key="pickup_filter",
     )
-    if pickup_choice != "Any pickup":
-        pools = [
-            p for p in pools
-            if (p.get("pickup") or "").strip().lower() == pickup_choice.strip().lower()
-        ]
 
-    # ---- NEW: Optional Date & Time window filter (works with pickup/destination) ----
     st.subheader("Time window (optional)")
-    enable_dt = False  # time window filter removed
-    if enable_dt:
-        fcol1, fcol2 = st.columns(2)
-        with fcol1:
-            day = st.date_input("Date", value=datetime.now().date(), key="flt_date")
-        with fcol2:
-            t1 = st.time_input("Start time", value=datetime.now().time().replace(second=0, microsecond=0), key="flt_t1")
-            t2 = st.time_input("End time", value=(datetime.now()+timedelta(hours=2)).time().replace(second=0, microsecond=0), key="flt_t2")
-        start_dt = datetime.combine(day, t1)
-        end_dt = datetime.combine(day, t2)
-        if end_dt < start_dt:
-            start_dt, end_dt = end_dt, start_dt
-        def _within_window(p):
-            try:
-                dt = datetime.fromisoformat(p["when_iso"])  # stored as ISO string
-                return start_dt <= dt <= end_dt
-            except Exception:
-                return False
-        pools = [p for p in pools if _within_window(p)]
     # Date-only filter (replaces previous time window)
+    day_s: Optional[str] = None
     date_filter_on = st.checkbox("Filter by date", value=False, key="date_filter_only")
     if date_filter_on:
         date_pick = st.date_input("On date", value=datetime.now().date(), key="date_filter_only_date")
-        try:
-            pools = [p for p in pools if datetime.fromisoformat(p["when_iso"]).date() == date_pick]
-        except Exception:
-            pass
+        day_s = date_pick.isoformat()
+
+    # Filtered list is cached per filter combination; mutators clear it
+    pools = filtered_pools_cached(
+        pools_version(),
+        None if dest_choice == "All destinations" else dest_choice,
+        None if pickup_choice == "Any pickup" else pickup_choice,
+        day_s,
+    )
+
+    # If a pool was just deleted, hide it immediately before rendering
+    _prune = st.session_state.pop("_deleted_pool_id", None)
+    if _prune:
+        pools = [p for p in pools if p.get("id") != _prune]
 
     # Bring shared pool to top
     focus_pool = None
@@ -933,100 +1227,172 @@ def pools_list_ui(user: Dict[str, str]):
         if focus_pool:
             pools = [focus_pool] + [p for p in pools if p.get("id") != focus_pool.get("id")]
 
-    # Sort by time (chronological)
-    pools.sort(key=lambda x: x["when_iso"])
-
     st.subheader("Available Pools")
     if not pools:
         st.info("No pools yet. Be the first to create one!")
         return
 
-    for p in pools:
-        pid = p.get("id")
-        cols = st.columns([5, 2, 2, 3])
-        with cols[0]:
-            title_lines = [f"**{p['destination_name']}**"]
-            if focus_id and pid == focus_id:
-                title_lines.append(":link: _Linked from share_")
-            st.markdown("  \n".join(title_lines))
-
-            dt_str = datetime.fromisoformat(p["when_iso"]).strftime("%d %b %Y, %I:%M %p")
-            st.caption(f"{dt_str} • {p['mode']}")
-            st.caption(f"Host: {p['host_name']} ({p['host_email']})")
-            if p.get("pickup"):
-                st.caption(f"Pickup: {p['pickup']}")
-            if p.get("notes"):
-                st.write(p["notes"]) 
-        with cols[1]:
-            member_count = get_members_count(pid)
-            st.metric("Members", f"{member_count}/{p['seats']}")
-        with cols[2]:
-            st.empty()  # reserved column (distance removed in presets build)
-        with cols[3]:
-            cur_count = get_members_count(pid)
-            already = is_user_member(pid, user["email"]) or (p.get("host_email") == user["email"])  # host can always see
-            if is_user_member(pid, user["email"]):
-                if st.button("Leave", key=f"leave_{pid}"):
-                    leave_pool(pid, user["email"])
-                    st.success("You left the pool.")
-                    st.rerun()
-            elif cur_count < p["seats"]:
-                if st.button("Join", key=f"join_{pid}"):
-                    ok, msg = join_pool(pid, user["name"], user["email"])
-                    if ok:
-                        st.success("Joined!")
-                    else:
-                        st.warning(msg)
-                    st.rerun()
+    # Render a window of rows (focused pool stays first); the rest behind "Load more"
+    page = st.session_state.get("_pools_page", 1)
+    visible = pools[: page * PAGE_SIZE]
+    pids = tuple(p["id"] for p in visible)
+    bulk = membership_bulk_cached(pools_version(), pids, user["email"])
+    by_id = {p["id"]: p for p in visible}
+
+    # One table element for the whole window; only the opened pool gets a full card
+    st.dataframe(
+        [
+            {
+                "Destination": p["destination_name"],
+                "When": p["_when_display"],
+                "Mode": p["mode"],
+                "Pickup": p.get("pickup") or "",
+                "Host": p["host_name"],
+                "Members": f"{bulk.get(p['id'], (0, False))[0]}/{p['seats']}",
+            }
+            for p in visible
+        ],
+        use_container_width=True,
+        hide_index=True,
+    )
+    open_id = st.selectbox(
+        "Open a pool",
+        pids,
+        index=0,
+        key="open_pool",
+        format_func=lambda pid: f"{by_id[pid]['destination_name']} – {by_id[pid]['_when_display']}",
+    )
+    p = by_id[open_id]
+    # Member list is readable by members and the host only
+    can_see = bulk.get(open_id, (0, False))[1] or p.get("host_email") == user["email"]
+    pool_card(p, user, focus_id, pids, (open_id,) if can_see else ())
+    if len(visible) < len(pools):
+        st.button(
+            f"Load more ({len(pools) - len(visible)} more)",
+            key="pools_load_more",
+            on_click=lambda: st.session_state.update(_pools_page=page + 1),
+        )
+
+
+# Card actions run as on_click callbacks: they finish before the card (fragment) or
+# app reruns for the click, so the redraw already reflects them without st.rerun().
+
+def _on_join(pid: str, user: Dict[str, str]):
+    st.session_state["_last_act"] = time.monotonic()
+    ok, msg = join_pool(pid, user["name"], user["email"])
+    st.toast("Joined!" if ok else msg)
+
+
+def _on_leave(pid: str, email: str):
+    st.session_state["_last_act"] = time.monotonic()
+    leave_pool(pid, email)
+    st.toast("You left the pool.")
+
+
+def _on_delete(pid: str, email: str):
+    st.session_state["_last_act"] = time.monotonic()
+    if delete_pool(pid, email):
+        st.session_state["_deleted_pool_id"] = pid
+        st.toast("Deleted")
+    else:
+        st.toast("You can't delete this pool.")
+
+
+def _on_share(pid: str):
+    # Only the last shared pool shows its link box
+    st.session_state["_share_pid"] = pid
+    try:
+        st.query_params["pool"] = pid
+    except Exception:
+        pass
+
+
+def _on_send(pid: str, user: Dict[str, str]):
+    # st.chat_input clears itself; the card's chat_messages() delta read picks the row up
+    text = (st.session_state.get(f"chat_text_{pid}") or "").strip()
+    if text:
+        add_message(pid, user["name"], user["email"], text)
+        _chat_buf(pid)["idle"] = 0
+
+
+def _pool_card(
+    p: Dict[str, Any],
+    user: Dict[str, str],
+    focus_id: Optional[str],
+    pids: Tuple[str, ...],
+    open_pids: Tuple[str, ...],
+):
+    """One pool card; runs as a fragment so Join/Leave/Send only rerun this card."""
+    pid = p.get("id")
+    if st.session_state.get("_deleted_pool_id") == pid:
+        # Deleted from this card: the table, picker and count need the list rebuilt
+        st.rerun()
+    # Same cache key for every card in a run -> one query; a mutation bumps the version
+    bulk = membership_bulk_cached(pools_version(), pids, user["email"])
+    member_count, is_member = bulk.get(pid, (0, False))
+    is_host = p.get("host_email") == user["email"]
+    already = is_member or is_host  # host can always see members & chat
+    cols = st.columns([5, 2, 3])  # title | members | actions (no distance column in the presets build)
+    with cols[0]:
+        st.markdown(
+            f"**{p['destination_name']}**" + ("  \n:link: _Linked from share_" if pid == focus_id else "")
+        )
+
+        st.caption(
+            f"{p['_when_display']} • {p['mode']}  \nHost: {p['host_name']} ({p['host_email']})"
+            + (f"  \nPickup: {p['pickup']}" if p.get("pickup") else "")
+        )
+        if p.get("notes"):
+            st.write(p["notes"]) 
+    with cols[1]:
+        st.metric("Members", f"{member_count}/{p['seats']}")
+    with cols[2]:
+        if is_member:
+            st.button("Leave", key=f"leave_{pid}", on_click=_on_leave, args=(pid, user["email"]))
+        elif member_count < p["seats"]:
+            st.button("Join", key=f"join_{pid}", on_click=_on_join, args=(pid, user))
+        else:
+            st.button("Full", disabled=True, key=f"full_{pid}")
+
+        st.button("Share link", key=f"share_{pid}", on_click=_on_share, args=(pid,))
+        if st.session_state.get("_share_pid") == pid:
+            st.info("Link set in your address bar; copy & share.")
+            st.text_input("Share this", value=f"?pool={pid}", key=f"share_link_{pid}")
+
+        if is_host:
+            st.button("Delete", key=f"del_{pid}", on_click=_on_delete, args=(pid, user["email"]))
+
+    # --- Members & Chat (visible to members/host only) ---
+    if already:
+        with st.expander(f"👥 Members ({member_count}/{p['seats']})", expanded=False):
+            lists = member_lists_cached(pools_version(), open_pids)
+            # Joined since the list was built (fragment rerun): read this pool alone
+            mlist = lists[pid] if pid in lists else get_member_list(pid)
+            if not mlist:
+                st.caption("No members yet.")
+            else:
+                for m in mlist:
+                    st.write(f"• {m.get('name','')} ({m.get('email','')})")
+
+        with st.expander("💬 Chat (beta)", expanded=False):
+            msgs = chat_messages(pid)
+            if st_fragment is not None and st_autorefresh is not None:
+                # Expander bodies run even when collapsed, so polling is opt-in.
+                # Inside the card fragment each tick reruns only the card; backs off while quiet.
+                if st.toggle("Live chat", key=f"chat_live_{pid}"):
+                    st_autorefresh(interval=chat_poll_ms(pid), key=f"chat_refresh_{pid}")
+            if msgs:
+                for msg in msgs:
+                    who = msg.get("sender_name") or msg.get("sender_email")
+                    when = msg.get("created_at", "")
+                    st.markdown(f"**{who}**  _{when}_  \n{msg.get('content', '')}")
             else:
-                st.button("Full", disabled=True, key=f"full_{pid}")
-
-            if st.button("Share link", key=f"share_{pid}"):
-                try:
-                    st.query_params["pool"] = pid
-                except Exception:
-                    pass
-                st.info("Link set in your address bar; copy & share.")
-                st.text_input("Share this", value=f"?pool={pid}", key=f"link_{pid}")
-
-            if p.get("host_email") == user["email"]:
-                if st.button("Delete", key=f"del_{pid}"):
-                    ok = delete_pool(pid, user["email"])
-                    if ok:
-                        st.success("Deleted")
-                        st.session_state["_deleted_pool_id"] = pid
-                        st.rerun()
-                    else:
-                        st.warning("You can't delete this pool.")
-
-        # --- Members & Chat (visible to members/host only) ---
-        if already:
-            with st.expander(f"👥 Members ({get_members_count(pid)}/{p['seats']})", expanded=False):
-                mlist = get_member_list(pid)
-                if not mlist:
-                    st.caption("No members yet.")
-                else:
-                    for m in mlist:
-                        st.write(f"• {m.get('name','')} ({m.get('email','')})")
-
-            with st.expander("💬 Chat (beta)", expanded=False):
-               # Chat auto-refresh removed; keeping block non-empty to avoid IndentationError
-                # Chat auto-refresh removed
-                msgs = list_messages(pid)
-                if msgs:
-                    for msg in msgs[-200:]:
-                        who = msg.get("sender_name") or msg.get("sender_email")
-                        when = msg.get("created_at", "")
-                        st.markdown(f"**{who}**  _{when}_  \n{msg.get('content', '')}")
-                else:
-                    st.caption("No messages yet. Start the conversation!")
-
-                with st.form(f"chat_send_{pid}", clear_on_submit=True):
-                    text = st.text_input("Message", placeholder="Type and press Send…")
-                    sent = st.form_submit_button("Send")
-                if sent and text.strip():
-                    add_message(pid, user["name"], user["email"], text.strip())
-                    st.rerun()
+                st.caption("No messages yet. Start the conversation!")
+
+            st.chat_input("Type a message…", key=f"chat_text_{pid}", on_submit=_on_send, args=(pid, user))
+
+
+pool_card = st_fragment(_pool_card) if st_fragment is not None else _pool_card
 
 # ---------------------------------
 # App entry